@@ -4,6 +4,7 @@ Copy this file to config.py and add your actual API key.
 """
 
 import os
+from functools import cache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -32,9 +33,11 @@ MIN_QUERY_LENGTH = 5
 MAX_WEEKS = 52
 MIN_WEEKS = 1
 
+@cache
 def setup_openai_client():
     """
     Set up OpenAI client with API key.
+    The client is created once and reused on later calls.
     
     Returns:
         OpenAI: Configured OpenAI client
@@ -52,6 +55,7 @@ def setup_openai_client():
     from openai import OpenAI
     return OpenAI()
 
+@cache
 def get_image_path():
     """
     Get the path to the Apple Watch image file.
@@ -3,11 +3,113 @@ Database operations for AI fitness coach.
 Handles SQLite storage and retrieval of training plans.
 """
 
+import atexit
 import sqlite3
 import os
+import threading
+from itertools import groupby
+from operator import itemgetter
 from typing import Optional
 from models import RunningPlan, DailyPlan, DailyMeal
 
+# Statements reused for every saved plan
+SQL_INSERT_PLAN = "INSERT INTO running_plan (motivation, feedback, supplement_suggestion) VALUES (?, ?, ?)"
+SQL_INSERT_DAILY = "INSERT INTO daily_plan (running_plan_id, day, titles, details, week_number) VALUES (?, ?, ?, ?, ?)"
+SQL_INSERT_MEAL = "INSERT INTO daily_meal (daily_plan_id, meal_type, suggestion, calories) VALUES (?, ?, ?, ?)"
+SQL_SELECT_DAILY_IDS = "SELECT id FROM daily_plan WHERE running_plan_id = ? ORDER BY id"
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite connection tuned for this application's workload.
+
+    Args:
+        db_path (str): Path to SQLite database file
+
+    Returns:
+        sqlite3.Connection: Open database connection
+    """
+    # Connections are cached and shared, so allow use from any thread
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    conn.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_spill=false;
+        PRAGMA foreign_keys=ON;
+    ''')
+    return conn
+
+# Open connections keyed by database path, shared across calls
+_conn_cache: dict[str, sqlite3.Connection] = {}
+
+# Serializes access to the shared connections; each transaction holds it
+# so concurrent callers cannot commit or roll back each other's work
+_db_lock = threading.RLock()
+
+def get_conn(db_path: str) -> sqlite3.Connection:
+    """
+    Get the shared connection for a database, opening it on first use.
+    
+    Args:
+        db_path (str): Path to SQLite database file
+        
+    Returns:
+        sqlite3.Connection: Cached database connection
+    """
+    with _db_lock:
+        if db_path not in _conn_cache:
+            conn = _connect(db_path)
+            # Foreign keys are enforced on every connection, so databases created
+            # by older versions need cascading deletes before any other call
+            _add_cascade_to_legacy_tables(conn)
+            _conn_cache[db_path] = conn
+        return _conn_cache[db_path]
+
+def _close_all_connections() -> None:
+    """Close every cached connection at interpreter exit."""
+    with _db_lock:
+        for conn in _conn_cache.values():
+            conn.close()
+        _conn_cache.clear()
+
+atexit.register(_close_all_connections)
+
+# Database paths whose schema has already been created in this process
+_initialized_paths: set[str] = set()
+
+def _add_cascade_to_legacy_tables(conn: sqlite3.Connection) -> None:
+    """
+    Rebuild child tables created before their foreign keys used ON DELETE CASCADE.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+    """
+    for table, parent in (("daily_plan", "running_plan"), ("daily_meal", "daily_plan")):
+        foreign_keys = conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+        if not foreign_keys or foreign_keys[0][6] == "CASCADE":
+            continue
+
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()[0]
+        new_sql = sql.replace(f"CREATE TABLE {table}", f"CREATE TABLE {table}_new", 1).replace(
+            f"REFERENCES {parent} (id)", f"REFERENCES {parent} (id) ON DELETE CASCADE"
+        )
+
+        # Foreign keys must be off while the old table is dropped
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.execute(new_sql)
+                conn.execute(f"INSERT INTO {table}_new SELECT * FROM {table}")
+                conn.execute(f"DROP TABLE {table}")
+                conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+
 def create_database_schema(db_path: str = "instance/flaskr.sqlite") -> bool:
     """
     Create the database schema for storing training plans.
@@ -19,51 +121,65 @@ def create_database_schema(db_path: str = "instance/flaskr.sqlite") -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        
-        # Create running_plan table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS running_plan (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                motivation TEXT NOT NULL,
-                feedback TEXT NOT NULL,
-                supplement_suggestion TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create daily_plan table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS daily_plan (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                running_plan_id INTEGER NOT NULL,
-                day TEXT NOT NULL,
-                titles TEXT NOT NULL,
-                details TEXT NOT NULL,
-                week_number INTEGER NOT NULL,
-                FOREIGN KEY (running_plan_id) REFERENCES running_plan (id)
-            )
-        ''')
-        
-        # Create daily_meal table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS daily_meal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                daily_plan_id INTEGER NOT NULL,
-                meal_type TEXT NOT NULL,
-                suggestion TEXT NOT NULL,
-                calories TEXT NOT NULL,
-                FOREIGN KEY (daily_plan_id) REFERENCES daily_plan (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        return True
+        with _db_lock:
+            if db_path in _initialized_paths:
+                return True
+
+            # Ensure the directory exists
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+            conn = get_conn(db_path)
+            cur = conn.cursor()
+
+            # Create running_plan table
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS running_plan (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    motivation TEXT NOT NULL,
+                    feedback TEXT NOT NULL,
+                    supplement_suggestion TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Create daily_plan table
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS daily_plan (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    running_plan_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    titles TEXT NOT NULL,
+                    details TEXT NOT NULL,
+                    week_number INTEGER NOT NULL,
+                    FOREIGN KEY (running_plan_id) REFERENCES running_plan (id) ON DELETE CASCADE
+                )
+            ''')
+
+            # Create daily_meal table
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS daily_meal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    daily_plan_id INTEGER NOT NULL,
+                    meal_type TEXT NOT NULL,
+                    suggestion TEXT NOT NULL,
+                    calories TEXT NOT NULL,
+                    FOREIGN KEY (daily_plan_id) REFERENCES daily_plan (id) ON DELETE CASCADE
+                )
+            ''')
+
+            # Index foreign keys used by load and delete lookups
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_daily_plan_running
+                ON daily_plan (running_plan_id, week_number)
+            ''')
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_daily_meal_plan
+                ON daily_meal (daily_plan_id, meal_type)
+            ''')
+
+            conn.commit()
+            _initialized_paths.add(db_path)
+            return True
         
     except Exception as e:
         print(f"❌ Error creating database schema: {str(e)}")
@@ -81,36 +197,39 @@ def save_plan_to_db(plan: RunningPlan, db_path: str = "instance/flaskr.sqlite")
         Optional[int]: Running plan ID if successful, None otherwise
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        
-        # Insert into running_plan table
-        cur.execute(
-            "INSERT INTO running_plan (motivation, feedback, supplement_suggestion) VALUES (?, ?, ?)",
-            (plan.motivation, plan.feedback, plan.supplement_suggestion),
-        )
-        running_plan_id = cur.lastrowid
-
-        # Insert weekly schedules and daily plans
-        for week_num, weekly_schedule in enumerate(plan.plan, start=1):
-            for daily in weekly_schedule:
-                # Insert daily plan
-                cur.execute(
-                    "INSERT INTO daily_plan (running_plan_id, day, titles, details, week_number) VALUES (?, ?, ?, ?, ?)",
-                    (running_plan_id, daily.day, daily.titles, daily.details, week_num),
-                )
-                daily_plan_id = cur.lastrowid
-
-                # Insert meals for this day
-                for meal_type in ['breakfast', 'lunch', 'dinner']:
-                    meal = getattr(daily, meal_type)
-                    cur.execute(
-                        "INSERT INTO daily_meal (daily_plan_id, meal_type, suggestion, calories) VALUES (?, ?, ?, ?)",
-                        (daily_plan_id, meal_type, meal.suggestion, meal.calories),
-                    )
-
-        conn.commit()
-        conn.close()
+        conn = get_conn(db_path)
+        # Run all inserts in one transaction: commit on success, roll back on error
+        with _db_lock, conn:
+            cur = conn.cursor()
+
+            # Insert into running_plan table
+            cur.execute(SQL_INSERT_PLAN, (plan.motivation, plan.feedback, plan.supplement_suggestion))
+            running_plan_id = cur.lastrowid
+
+            # Insert all daily plans in one batch
+            dailies = [
+                (week_num, daily)
+                for week_num, weekly_schedule in enumerate(plan.plan, start=1)
+                for daily in weekly_schedule
+            ]
+            cur.executemany(
+                SQL_INSERT_DAILY,
+                [(running_plan_id, daily.day, daily.titles, daily.details, week_num) for week_num, daily in dailies],
+            )
+
+            # IDs are assigned in insertion order, so pair them back up with the days
+            cur.execute(SQL_SELECT_DAILY_IDS, (running_plan_id,))
+            meal_rows = []
+            for (daily_plan_id,), (_, daily) in zip(cur.fetchall(), dailies):
+                meal_rows.extend((
+                    (daily_plan_id, 'breakfast', daily.breakfast.suggestion, daily.breakfast.calories),
+                    (daily_plan_id, 'lunch', daily.lunch.suggestion, daily.lunch.calories),
+                    (daily_plan_id, 'dinner', daily.dinner.suggestion, daily.dinner.calories),
+                ))
+
+            # Insert all meals in one batch
+            cur.executemany(SQL_INSERT_MEAL, meal_rows)
+
         return running_plan_id
         
     except Exception as e:
@@ -129,12 +248,25 @@ def load_plan_from_db(plan_id: int, db_path: str = "instance/flaskr.sqlite") ->
         Optional[RunningPlan]: Reconstructed training plan object or None
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
+        conn = get_conn(db_path)
         
-        # Get plan details
-        cur.execute("SELECT motivation, feedback, supplement_suggestion FROM running_plan WHERE id = ?", (plan_id,))
-        plan_data = cur.fetchone()
+        with _db_lock:
+            cur = conn.cursor()
+            
+            # Get plan details
+            cur.execute("SELECT motivation, feedback, supplement_suggestion FROM running_plan WHERE id = ?", (plan_id,))
+            plan_data = cur.fetchone()
+            
+            # Get daily plans and their meals in one scan, in the order they were saved
+            cur.execute('''
+                SELECT dp.id, dp.day, dp.titles, dp.details, dp.week_number,
+                       dm.meal_type, dm.suggestion, dm.calories
+                FROM daily_plan dp
+                JOIN daily_meal dm ON dm.daily_plan_id = dp.id
+                WHERE dp.running_plan_id = ?
+                ORDER BY dp.week_number, dp.id
+            ''', (plan_id,))
+            day_rows = cur.fetchall()
         
         if not plan_data:
             print(f"❌ Plan with ID {plan_id} not found")
@@ -142,30 +274,13 @@ def load_plan_from_db(plan_id: int, db_path: str = "instance/flaskr.sqlite") ->
         
         motivation, feedback, supplement_suggestion = plan_data
         
-        # Get daily plans grouped by week
-        cur.execute('''
-            SELECT dp.day, dp.titles, dp.details, dp.week_number,
-                   dm1.suggestion as breakfast_suggestion, dm1.calories as breakfast_calories,
-                   dm2.suggestion as lunch_suggestion, dm2.calories as lunch_calories,
-                   dm3.suggestion as dinner_suggestion, dm3.calories as dinner_calories
-            FROM daily_plan dp
-            LEFT JOIN daily_meal dm1 ON dp.id = dm1.daily_plan_id AND dm1.meal_type = 'breakfast'
-            LEFT JOIN daily_meal dm2 ON dp.id = dm2.daily_plan_id AND dm2.meal_type = 'lunch'
-            LEFT JOIN daily_meal dm3 ON dp.id = dm3.daily_plan_id AND dm3.meal_type = 'dinner'
-            WHERE dp.running_plan_id = ?
-            ORDER BY dp.week_number, dp.day
-        ''', (plan_id,))
-        
-        daily_data = cur.fetchall()
-        conn.close()
-        
-        # Reconstruct the plan structure
+        # Reconstruct the plan structure, pivoting each day's meal rows
         weeks = {}
-        for row in daily_data:
-            day, titles, details, week_num = row[:4]
-            breakfast_suggestion, breakfast_calories = row[4:6]
-            lunch_suggestion, lunch_calories = row[6:8]
-            dinner_suggestion, dinner_calories = row[8:10]
+        for (_, day, titles, details, week_num), rows in groupby(day_rows, key=itemgetter(0, 1, 2, 3, 4)):
+            day_meals = {
+                meal_type: DailyMeal(suggestion=suggestion, calories=calories)
+                for *_, meal_type, suggestion, calories in rows
+            }
             
             if week_num not in weeks:
                 weeks[week_num] = []
@@ -174,9 +289,9 @@ def load_plan_from_db(plan_id: int, db_path: str = "instance/flaskr.sqlite") ->
                 day=day,
                 titles=titles,
                 details=details,
-                breakfast=DailyMeal(suggestion=breakfast_suggestion, calories=breakfast_calories),
-                lunch=DailyMeal(suggestion=lunch_suggestion, calories=lunch_calories),
-                dinner=DailyMeal(suggestion=dinner_suggestion, calories=dinner_calories)
+                breakfast=day_meals['breakfast'],
+                lunch=day_meals['lunch'],
+                dinner=day_meals['dinner']
             )
             weeks[week_num].append(daily_plan)
         
@@ -194,36 +309,37 @@ def load_plan_from_db(plan_id: int, db_path: str = "instance/flaskr.sqlite") ->
         print(f"❌ Error loading plan from database: {str(e)}")
         return None
 
-def list_all_plans(db_path: str = "instance/flaskr.sqlite") -> list:
+def list_all_plans(db_path: str = "instance/flaskr.sqlite", limit: int = 100, offset: int = 0) -> list:
     """
-    List all training plans in the database.
+    List training plans in the database, newest first, one page at a time.
     
     Args:
         db_path (str): Path to SQLite database file
+        limit (int): Maximum number of plans to return
+        offset (int): Number of plans to skip
         
     Returns:
         list: List of plan summaries
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
+        conn = get_conn(db_path)
         
-        cur.execute('''
-            SELECT id, motivation, created_at 
-            FROM running_plan 
-            ORDER BY created_at DESC
-        ''')
-        
-        plans = cur.fetchall()
-        conn.close()
+        # Truncate motivations in SQL so only the preview leaves SQLite
+        with _db_lock:
+            rows = conn.execute('''
+                SELECT id, substr(motivation, 1, 50), length(motivation), created_at
+                FROM running_plan 
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset)).fetchall()
         
         return [
             {
-                "id": plan[0],
-                "motivation": plan[1][:50] + "..." if len(plan[1]) > 50 else plan[1],
-                "created_at": plan[2]
+                "id": plan_id,
+                "motivation": motivation + "..." if length > 50 else motivation,
+                "created_at": created_at
             }
-            for plan in plans
+            for plan_id, motivation, length, created_at in rows
         ]
         
     except Exception as e:
@@ -242,22 +358,11 @@ def delete_plan(plan_id: int, db_path: str = "instance/flaskr.sqlite") -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        
-        # Delete in reverse order of foreign key dependencies
-        cur.execute('''
-            DELETE FROM daily_meal 
-            WHERE daily_plan_id IN (
-                SELECT id FROM daily_plan WHERE running_plan_id = ?
-            )
-        ''', (plan_id,))
-        
-        cur.execute('DELETE FROM daily_plan WHERE running_plan_id = ?', (plan_id,))
-        cur.execute('DELETE FROM running_plan WHERE id = ?', (plan_id,))
-        
-        conn.commit()
-        conn.close()
+        conn = get_conn(db_path)
+        # Daily plans and meals are removed by ON DELETE CASCADE
+        with _db_lock, conn:
+            conn.execute('DELETE FROM running_plan WHERE id = ?', (plan_id,))
+
         return True
         
     except Exception as e:
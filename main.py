@@ -5,67 +5,134 @@ Handles user input, image processing, API calls, and output generation.
 
 import os
 import sys
-from models import RunningPlan, SYSTEM_PROMPT
-from database import save_plan_to_db, create_database_schema
-from output_generators import generate_html_training_plan, print_plan_summary, create_css_file
-from utils import encode_image, validate_image, validate_user_input, create_example_image_path
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import Optional
 
-# Try to import config, fall back to basic setup if not available
-try:
-    from config import setup_openai_client, get_image_path
-    client = setup_openai_client()
-    IMAGE_PATH = get_image_path()
-except ImportError:
-    print("⚠️  config.py not found. Using basic configuration.")
-    print("   For better setup, copy config_example.py to config.py")
-    
-    # Basic fallback configuration
-    from openai import OpenAI
-    
-    # Check for API key in environment
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("❌ OpenAI API key not found!")
-        print("   Please set OPENAI_API_KEY environment variable or create config.py")
-        sys.exit(1)
-    
-    client = OpenAI()
-    IMAGE_PATH = "IMG_4830.png"
+def setup_client() -> tuple:
+    """
+    Set up the OpenAI client, preferring settings from config.py.
+    
+    Returns:
+        tuple: (OpenAI client, default image path)
+    """
+    # Try to import config, fall back to basic setup if not available
+    try:
+        from config import setup_openai_client, get_image_path
+        return setup_openai_client(), get_image_path()
+    except ImportError:
+        print("⚠️  config.py not found. Using basic configuration.")
+        print("   For better setup, copy config_example.py to config.py")
+        
+        # Basic fallback configuration
+        from openai import OpenAI
+        
+        # Check for API key in environment
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            print("❌ OpenAI API key not found!")
+            print("   Please set OPENAI_API_KEY environment variable or create config.py")
+            sys.exit(1)
+        
+        return OpenAI(), "IMG_4830.png"
 
-def create_structured_request(user_query: str, base64_image: str) -> dict:
+def upload_image(client, image_path: str) -> str:
+    """
+    Upload an image through the OpenAI Files API.
+    
+    Sending a file ID keeps the image out of the request body instead of
+    inlining it as a base64 data URL.
+    
+    Args:
+        client (OpenAI): Configured OpenAI client
+        image_path (str): Path to the image file
+        
+    Returns:
+        str: ID of the uploaded file
+    """
+    with open(image_path, "rb") as image_file:
+        return client.files.create(file=image_file, purpose="vision").id
+
+@cache
+def system_message() -> dict:
+    """
+    Build the system message once and share it across requests.
+    
+    Returns:
+        dict: System message with the coaching prompt (treat as read-only)
+    """
+    from models import SYSTEM_PROMPT
+    
+    return {"role": "system", "content": SYSTEM_PROMPT}
+
+def create_structured_request(user_query: str, image_file_id: Optional[str] = None) -> dict:
     """
     Create a structured request for the OpenAI API.
     
     Args:
         user_query (str): User's running goal
-        base64_image (str): Base64 encoded image data
+        image_file_id (Optional[str]): ID of the uploaded image file, if any
         
     Returns:
         dict: Formatted request parameters
     """
+    from models import RunningPlan
+    
+    content = [{"type": "input_text", "text": user_query}]
+    
+    # Only reference the image when one was uploaded
+    if image_file_id:
+        content.append({"type": "input_image", "file_id": image_file_id})
+    
     return {
         "model": "gpt-4o",
         "input": [
-            {
-                "role": "system",
-                "content": SYSTEM_PROMPT
-            },
+            system_message(),
             {
                 "role": "user",
-                "content": [
-                    {"type": "input_text", "text": user_query},
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{base64_image}",
-                    },
-                ],
+                "content": content,
             }
         ],
         "text_format": RunningPlan
     }
 
+def write_html_output(plan, filename: str = "training_plan.html") -> None:
+    """
+    Generate the HTML training plan and write it to disk.
+    
+    Args:
+        plan (RunningPlan): Structured training plan
+        filename (str): Output filename
+    """
+    from output_generators import generate_html_training_plan
+    
+    html_content = generate_html_training_plan(plan)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(html_content)
+
+def save_plan_record(plan):
+    """
+    Save the training plan to the database, creating the schema if needed.
+    
+    Args:
+        plan (RunningPlan): Structured training plan
+        
+    Returns:
+        Optional[int]: Running plan ID if successful, None otherwise
+    """
+    from database import save_plan_to_db, create_database_schema
+    
+    create_database_schema()  # Ensure database schema exists
+    return save_plan_to_db(plan)
+
 def main():
     """Main execution function."""
+    # Heavy dependencies are imported here so that --help stays fast
+    from output_generators import print_plan_summary, create_css_file
+    from utils import validate_image, validate_user_input, create_example_image_path
+    
+    client, _ = setup_client()
+    
     print("🏃‍♂️ AI Fitness Coach - Personalized Training Plans")
     print("=" * 50)
     
@@ -79,11 +146,11 @@ def main():
     
     # Image processing
     image_path = create_example_image_path()
-    base64_image = ""
+    image_file_id = None
     
     try:
         if validate_image(image_path):
-            base64_image = encode_image(image_path)
+            image_file_id = upload_image(client, image_path)
             print(f"✅ Image loaded successfully: {image_path}")
         else:
             print(f"⚠️  Image file not found at {image_path}.")
@@ -98,10 +165,18 @@ def main():
     
     try:
         # Create API request
-        request_params = create_structured_request(query, base64_image)
+        request_params = create_structured_request(query, image_file_id)
         
         # Make API call using new responses.parse method
-        response = client.responses.parse(**request_params)
+        try:
+            response = client.responses.parse(**request_params)
+        finally:
+            # The screenshot is only needed for this request, so don't keep it in file storage
+            if image_file_id:
+                try:
+                    client.files.delete(image_file_id)
+                except Exception as e:
+                    print(f"⚠️  Could not delete uploaded image: {str(e)}")
         
         # Extract parsed plan
         plan = response.output_parsed
@@ -112,25 +187,30 @@ def main():
         # Generate outputs
         print("\\n📄 Generating output files...")
         
-        # Create CSS file
+        # Create CSS file before the workers start, so its message comes first
         create_css_file()
-        
-        # Generate HTML output
-        html_content = generate_html_training_plan(plan)
-        with open("training_plan.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
-        print("✅ HTML file generated: training_plan.html")
-        
-        # Save to database
+
+        # Write the HTML file and database record in the background; leaving the
+        # block waits for both, so the save is reported even if the HTML write fails
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            html_future = executor.submit(write_html_output, plan)
+            db_future = executor.submit(save_plan_record, plan)
+
+        html_error = html_future.exception()
+        if html_error is None:
+            print("✅ HTML file generated: training_plan.html")
+
         try:
-            create_database_schema()  # Ensure database schema exists
-            plan_id = save_plan_to_db(plan)
+            plan_id = db_future.result()
             if plan_id:
                 print(f"✅ Plan saved to database with ID: {plan_id}")
             else:
                 print("⚠️  Database save failed")
         except Exception as db_error:
             print(f"⚠️  Database save failed: {str(db_error)}")
+
+        if html_error is not None:
+            raise html_error
         
         print("\\n🎉 Training plan generation complete!")
         print("\\nFiles created:")
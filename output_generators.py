@@ -3,23 +3,15 @@ Output generation utilities for AI fitness coach.
 Converts structured RunningPlan objects into various output formats.
 """
 
-import json
+import hashlib
+import os
+import sys
+from html import escape
 from typing import Dict, Any
-from models import RunningPlan, DailyPlan
+from models import RunningPlan
 
-def generate_html_training_plan(plan: RunningPlan) -> str:
-    """
-    Convert RunningPlan object to formatted HTML with CSS classes.
-    Based on the actual implementation with embedded styling.
-    
-    Args:
-        plan (RunningPlan): Structured training plan from AI response
-        
-    Returns:
-        str: Formatted HTML string with CSS classes
-    """
-    try:
-        html = f"""
+# Static page fragments shared by every generated plan
+HTML_HEAD = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -29,47 +21,83 @@ def generate_html_training_plan(plan: RunningPlan) -> str:
 </head>
 """
 
-        html += f"""
+HTML_FOOTER = """  </div>
+</body>
+</html>
+"""
+
+# Templates for the repeated per-plan, per-week and per-day blocks
+HEADER_TMPL = """
 <body>
 <header class="plan-header">
-    <h1>{plan.motivation}</h1>
-    <p class="plan-feedback">{plan.feedback}</p>
-    <p class="plan-supplements">{plan.supplement_suggestion}</p>
+    <h1>{motivation}</h1>
+    <p class="plan-feedback">{feedback}</p>
+    <p class="plan-supplements">{supplements}</p>
 </header>
-"""
-        
-        html += f"""<div class="week-grid">"""
-        
-        for week_idx, weekly in enumerate(plan.plan, start=1):
-            html += f'    <div class="week">\\n'
-            html += f'      <h2>Week {week_idx}</h2>\\n'
-            
-            # Loop through each day in the week
-            for day in weekly:
-                html += f"""      <div class="day">
-            <div class="day-title">{day.day} - {day.titles}</div>
-            <div class="details">{day.details}</div>
+<div class="week-grid">"""
+
+WEEK_OPEN = '    <div class="week">\n      <h2>Week {week}</h2>\n'
+
+WEEK_CLOSE = '    </div>\n'
+
+DAY_TMPL = """      <div class="day">
+            <div class="day-title">{day} - {titles}</div>
+            <div class="details">{details}</div>
             <div class="meal_plan">
             <h4>Nutrition Plan</h4>
             <ul>
-                <li><strong>Breakfast:</strong> {day.breakfast.suggestion} - ({day.breakfast.calories} kcal)</li>
-                <li><strong>Lunch:</strong> {day.lunch.suggestion} - ({day.lunch.calories} kcal)</li>
-                <li><strong>Dinner:</strong> {day.dinner.suggestion} - ({day.dinner.calories} kcal)</li>
+                <li><strong>Breakfast:</strong> {bs} - ({bc} kcal)</li>
+                <li><strong>Lunch:</strong> {ls} - ({lc} kcal)</li>
+                <li><strong>Dinner:</strong> {ds} - ({dc} kcal)</li>
             </ul>
             </div>
         </div>
     """
-            html += '    </div>\\n'
+
+def generate_html_training_plan(plan: RunningPlan) -> str:
+    """
+    Convert RunningPlan object to formatted HTML with CSS classes.
+    Based on the actual implementation with embedded styling.
+    
+    Args:
+        plan (RunningPlan): Structured training plan from AI response
+        
+    Returns:
+        str: Formatted HTML string with CSS classes
+    """
+    try:
+        parts = [HTML_HEAD]
+        # Plan text comes from the model, so escape it before inserting
+        parts.append(HEADER_TMPL.format(
+            motivation=escape(plan.motivation),
+            feedback=escape(plan.feedback),
+            supplements=escape(plan.supplement_suggestion),
+        ))
+        
+        for week_idx, weekly in enumerate(plan.plan, start=1):
+            parts.append(WEEK_OPEN.format(week=week_idx))
+            
+            # Loop through each day in the week
+            for day in weekly:
+                parts.append(DAY_TMPL.format(
+                    day=escape(day.day),
+                    titles=escape(day.titles),
+                    details=escape(day.details),
+                    bs=escape(day.breakfast.suggestion),
+                    bc=escape(day.breakfast.calories),
+                    ls=escape(day.lunch.suggestion),
+                    lc=escape(day.lunch.calories),
+                    ds=escape(day.dinner.suggestion),
+                    dc=escape(day.dinner.calories),
+                ))
+            parts.append(WEEK_CLOSE)
         
         # Close tags
-        html += """  </div>
-</body>
-</html>
-"""
-        return html
+        parts.append(HTML_FOOTER)
+        return "".join(parts)
         
     except Exception as e:
-        return f"<html><body><h1>Error generating HTML</h1><p>{str(e)}</p></body></html>"
+        return f"<html><body><h1>Error generating HTML</h1><p>{escape(str(e))}</p></body></html>"
 
 def save_training_plan_html(plan: RunningPlan, filename: str = "training_plan.html") -> bool:
     """
@@ -100,20 +128,24 @@ def print_plan_summary(plan: RunningPlan) -> None:
         plan (RunningPlan): Structured training plan
     """
     try:
-        print("\\n✅ Plan Generated Successfully!\\n")
-        print(f"💪 Motivation: {plan.motivation}\\n")
-        print(f"📊 Feedback: {plan.feedback}\\n")
-        print(f"💊 Supplements: {plan.supplement_suggestion}\\n")
+        # Collect all lines and write them at once rather than printing each
+        lines = [
+            "\\n✅ Plan Generated Successfully!\\n",
+            f"💪 Motivation: {plan.motivation}\\n",
+            f"📊 Feedback: {plan.feedback}\\n",
+            f"💊 Supplements: {plan.supplement_suggestion}\\n",
+        ]
 
         for i, weekly_schedule in enumerate(plan.plan, 1):
-            print(f"--- Week {i} ---")
+            lines.append(f"--- Week {i} ---")
             for daily_activity in weekly_schedule:
-                print(f"- {daily_activity.day}: {daily_activity.titles} - {daily_activity.details}")
-                print(f"  🥣 Breakfast: {daily_activity.breakfast.suggestion} ({daily_activity.breakfast.calories})")
-                print(f"  🥗 Lunch: {daily_activity.lunch.suggestion} ({daily_activity.lunch.calories})")
-                print(f"  🍽️ Dinner: {daily_activity.dinner.suggestion} ({daily_activity.dinner.calories})")
-                print()
-            
+                lines.append(f"- {daily_activity.day}: {daily_activity.titles} - {daily_activity.details}")
+                lines.append(f"  🥣 Breakfast: {daily_activity.breakfast.suggestion} ({daily_activity.breakfast.calories})")
+                lines.append(f"  🥗 Lunch: {daily_activity.lunch.suggestion} ({daily_activity.lunch.calories})")
+                lines.append(f"  🍽️ Dinner: {daily_activity.dinner.suggestion} ({daily_activity.dinner.calories})")
+                lines.append("")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
     except Exception as e:
         print(f"❌ Error printing plan summary: {str(e)}")
 
@@ -129,25 +161,19 @@ def export_plan_to_json(plan: RunningPlan, filename: str = "training_plan.json")
         bool: True if successful, False otherwise
     """
     try:
-        # Convert Pydantic model to dict
-        plan_dict = plan.model_dump()
+        # Serialize directly with Pydantic's native JSON encoder
+        plan_json = plan.model_dump_json(indent=2)
         
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(plan_dict, f, indent=2, ensure_ascii=False)
+            f.write(plan_json)
         print(f"✅ JSON file exported: {filename}")
         return True
     except Exception as e:
         print(f"❌ Error exporting JSON: {str(e)}")
         return False
 
-def create_css_file() -> bool:
-    """
-    Create a CSS file for styling the HTML training plans.
-    
-    Returns:
-        bool: True if successful, False otherwise
-    """
-    css_content = """
+# Stylesheet written alongside generated HTML plans
+CSS_CONTENT = """
 /* AI Fitness Coach - Training Plan Styles */
 body {
     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -289,10 +315,27 @@ body {
     }
 }
 """
+
+CSS_DIGEST = hashlib.blake2b(CSS_CONTENT.encode('utf-8')).hexdigest()
+
+def create_css_file() -> bool:
+    """
+    Create a CSS file for styling the HTML training plans.
     
+    Returns:
+        bool: True if successful, False otherwise
+    """
     try:
-        with open("style.css", "w", encoding='utf-8') as f:
-            f.write(css_content)
+        # Skip the write when the existing file already matches
+        if os.path.exists("style.css"):
+            with open("style.css", "rb") as f:
+                if hashlib.blake2b(f.read()).hexdigest() == CSS_DIGEST:
+                    print("✅ CSS file up to date: style.css")
+                    return True
+        
+        # Write the bytes the digest was taken over, with no newline translation
+        with open("style.css", "w", encoding='utf-8', newline='') as f:
+            f.write(CSS_CONTENT)
         print("✅ CSS file created: style.css")
         return True
     except Exception as e:
@@ -310,36 +353,20 @@ def validate_plan_structure(plan: RunningPlan) -> bool:
         bool: True if structure is valid
     """
     try:
-        # Check required fields
-        required_fields = ['motivation', 'feedback', 'supplement_suggestion', 'plan']
-        for field in required_fields:
-            if not hasattr(plan, field):
-                print(f"❌ Missing required field: {field}")
-                return False
+        # Pydantic validates every day and meal when the plan is built,
+        # so only the type and the week/day counts need checking here
+        if not isinstance(plan, RunningPlan):
+            print("❌ Plan is not a RunningPlan")
+            return False
         
-        # Check that plan is a list and has content
-        if not isinstance(plan.plan, list) or len(plan.plan) == 0:
+        if len(plan.plan) == 0:
             print("❌ Plan must contain at least one week")
             return False
-            
-        # Check weekly structure
+        
         for week_idx, week in enumerate(plan.plan, 1):
-            if not isinstance(week, list) or len(week) == 0:
+            if len(week) == 0:
                 print(f"❌ Week {week_idx} must contain at least one day")
                 return False
-                
-            # Check daily structure
-            for day_idx, day in enumerate(week):
-                if not isinstance(day, DailyPlan):
-                    print(f"❌ Day {day_idx + 1} in week {week_idx} has invalid structure")
-                    return False
-                    
-                # Check meal structure
-                for meal_type in ['breakfast', 'lunch', 'dinner']:
-                    meal = getattr(day, meal_type, None)
-                    if not meal or not hasattr(meal, 'suggestion') or not hasattr(meal, 'calories'):
-                        print(f"❌ Invalid {meal_type} structure in week {week_idx}, day {day_idx + 1}")
-                        return False
         
         print("✅ Training plan structure is valid")
         return True
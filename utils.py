@@ -3,10 +3,40 @@ Utility functions for AI fitness coach.
 Includes image processing, validation, and helper functions.
 """
 
-import base64
+import asyncio
+import io
 import os
-from PIL import Image
-from typing import Optional
+import re
+import struct
+from functools import lru_cache
+from typing import BinaryIO, Optional
+
+# Use the SIMD-accelerated pybase64 when installed, else the standard library
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# Bytes read per step when base64-encoding images (a multiple of 3)
+_ENCODE_CHUNK_SIZE = 57 * 1024
+
+# Matches week counts like "8 weeks", "in 12 weeks" or "10-week"
+_WEEKS_PATTERN = re.compile(r'(\d+)[\s-]*weeks?', re.IGNORECASE)
+
+# Longest side, in pixels, of images sent for analysis
+_MAX_IMAGE_DIMENSION = 1024
+
+# PIL modes for 8-bit PNG color types
+_PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+# PIL modes for JPEG component counts
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+# JPEG start-of-frame markers, which carry the image dimensions
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Leading bytes of JPEG, PNG and GIF files (WebP is checked separately)
+_IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF8')
 
 def encode_image(image_path: str) -> str:
     """
@@ -23,13 +53,32 @@ def encode_image(image_path: str) -> str:
         Exception: If image encoding fails
     """
     try:
+        encoded = bytearray()
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            # Chunk size is a multiple of 3, so no padding appears between chunks
+            while chunk := image_file.read(_ENCODE_CHUNK_SIZE):
+                encoded += _b64.b64encode(chunk)
+        # Base64 output is pure ASCII
+        return encoded.decode('ascii')
     except FileNotFoundError:
         raise FileNotFoundError(f"Image file not found: {image_path}")
     except Exception as e:
         raise Exception(f"Failed to encode image: {str(e)}")
 
+def _has_image_signature(header: bytes) -> bool:
+    """
+    Check whether file header bytes match an image format the API accepts.
+    
+    Args:
+        header (bytes): First 12 bytes of the file
+        
+    Returns:
+        bool: True for JPEG, PNG, GIF or WebP signatures
+    """
+    if header.startswith(_IMAGE_SIGNATURES):
+        return True
+    return header[:4] == b'RIFF' and header[8:12] == b'WEBP'
+
 def validate_image(image_path: str) -> bool:
     """
     Validate that the image file exists and is readable.
@@ -41,20 +90,74 @@ def validate_image(image_path: str) -> bool:
         bool: True if image is valid, False otherwise
     """
     try:
-        if not os.path.exists(image_path):
-            return False
-            
-        # Try to open with PIL to verify it's a valid image
-        with Image.open(image_path) as img:
-            img.verify()
-        return True
+        # Check the file signature instead of decoding the image
+        with open(image_path, "rb") as image_file:
+            return _has_image_signature(image_file.read(12))
         
-    except Exception:
+    except OSError:
         return False
 
+def _read_image_header(image_file: BinaryIO) -> Optional[tuple]:
+    """
+    Read size, format and mode of a PNG or JPEG directly from its header.
+    
+    Args:
+        image_file (BinaryIO): Binary file object positioned at the start
+        
+    Returns:
+        Optional[tuple]: ((width, height), format, mode), or None when the
+        header is not a PNG or JPEG this parser understands
+    """
+    head = image_file.read(26)
+    
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', head[16:24])
+        bit_depth, color_type = head[24], head[25]
+        if bit_depth != 8 or color_type not in _PNG_MODES:
+            return None
+        return (width, height), "PNG", _PNG_MODES[color_type]
+    
+    if head[:2] == b'\xff\xd8':
+        # Walk the marker segments until the start-of-frame segment
+        image_file.seek(2)
+        while True:
+            marker = image_file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            length_bytes = image_file.read(2)
+            if len(length_bytes) < 2:
+                return None
+            (length,) = struct.unpack('>H', length_bytes)
+            if marker[1] in _JPEG_SOF_MARKERS:
+                frame = image_file.read(6)
+                if len(frame) < 6 or frame[5] not in _JPEG_MODES:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return (width, height), "JPEG", _JPEG_MODES[frame[5]]
+            image_file.seek(length - 2, os.SEEK_CUR)
+    
+    return None
+
+def _read_image_info_with_pil(image_file: BinaryIO) -> tuple:
+    """
+    Read size, format and mode with PIL for formats the header parser skips.
+    
+    Args:
+        image_file (BinaryIO): Binary file object
+        
+    Returns:
+        tuple: ((width, height), format, mode)
+    """
+    from PIL import Image
+    
+    image_file.seek(0)
+    with Image.open(image_file) as img:
+        return img.size, img.format, img.mode
+
 def get_image_info(image_path: str) -> dict:
     """
     Get basic information about an image file.
+    PNG and JPEG headers are parsed directly; other formats fall back to PIL.
     
     Args:
         image_path (str): Path to the image file
@@ -63,16 +166,73 @@ def get_image_info(image_path: str) -> dict:
         dict: Image information including size, format, mode
     """
     try:
-        with Image.open(image_path) as img:
+        with open(image_path, "rb") as image_file:
+            header = _read_image_header(image_file) or _read_image_info_with_pil(image_file)
+            size, image_format, mode = header
             return {
-                "size": img.size,
-                "format": img.format,
-                "mode": img.mode,
-                "file_size": os.path.getsize(image_path)
+                "size": size,
+                "format": image_format,
+                "mode": mode,
+                "file_size": os.fstat(image_file.fileno()).st_size
             }
     except Exception as e:
         return {"error": str(e)}
 
+@lru_cache(maxsize=8)
+def _load_image_for_analysis(image_path: str, mtime: float, file_size: int) -> tuple[dict, str]:
+    """
+    Read, validate, inspect and encode an image from a single file read.
+    Images larger than _MAX_IMAGE_DIMENSION are downscaled to JPEG first.
+    Results are cached per file version.
+    
+    Args:
+        image_path (str): Path to the image file
+        mtime (float): File modification time, part of the cache key
+        file_size (int): File size in bytes, part of the cache key
+        
+    Returns:
+        tuple[dict, str]: (image information, data URL of the encoded image)
+    """
+    with open(image_path, "rb") as image_file:
+        data = image_file.read()
+    
+    if not _has_image_signature(data[:12]):
+        raise ValueError(f"Unsupported image format: {image_path}")
+    
+    # Inspect the image from memory rather than reopening the file
+    source = io.BytesIO(data)
+    dimensions, image_format, mode = _read_image_header(source) or _read_image_info_with_pil(source)
+    img_info = {
+        "size": dimensions,
+        "format": image_format,
+        "mode": mode,
+        "file_size": len(data)
+    }
+    
+    # The API downsamples large images anyway, so shrink them before encoding
+    if max(dimensions) > _MAX_IMAGE_DIMENSION:
+        from PIL import Image, ImageOps
+
+        source.seek(0)
+        with Image.open(source) as img:
+            # Saving as JPEG drops EXIF, so apply its orientation to the pixels first
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((_MAX_IMAGE_DIMENSION, _MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+
+            # JPEG has no alpha channel, so flatten transparency onto white
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+
+            output = io.BytesIO()
+            img.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+            data = output.getvalue()
+    
+    data_url = "data:image/jpeg;base64," + _b64.b64encode(data).decode('ascii')
+    return img_info, data_url
+
 def prepare_image_for_analysis(image_path: str) -> dict:
     """
     Prepare an Apple Watch screenshot for AI analysis.
@@ -81,26 +241,37 @@ def prepare_image_for_analysis(image_path: str) -> dict:
         image_path (str): Path to the Apple Watch screenshot
         
     Returns:
-        dict: Prepared data including base64 encoding and metadata
+        dict: Prepared data including the image data URL and metadata
         
     Raises:
         ValueError: If image is invalid or unreadable
     """
-    if not validate_image(image_path):
-        raise ValueError(f"Invalid or unreadable image: {image_path}")
-    
-    # Get image information
-    img_info = get_image_info(image_path)
-    
-    # Encode to base64
-    base64_image = encode_image(image_path)
+    try:
+        stat = os.stat(image_path)
+        img_info, data_url = _load_image_for_analysis(image_path, stat.st_mtime, stat.st_size)
+    except Exception as e:
+        raise ValueError(f"Invalid or unreadable image: {image_path}") from e
     
     return {
-        "base64_image": base64_image,
-        "image_info": img_info,
-        "data_url": f"data:image/jpeg;base64,{base64_image}"
+        "image_info": dict(img_info),
+        "data_url": data_url
     }
 
+async def prepare_image_for_analysis_async(image_path: str) -> dict:
+    """
+    Prepare an image for AI analysis without blocking the event loop.
+    
+    Args:
+        image_path (str): Path to the Apple Watch screenshot
+        
+    Returns:
+        dict: Prepared data including the image data URL and metadata
+        
+    Raises:
+        ValueError: If image is invalid or unreadable
+    """
+    return await asyncio.to_thread(prepare_image_for_analysis, image_path)
+
 def format_file_size(size_bytes: int) -> str:
     """
     Format file size in human-readable format.
@@ -114,13 +285,11 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
+    # Each unit step is 10 bits, capped at GB
+    size_names = ("B", "KB", "MB", "GB")
+    i = min((size_bytes.bit_length() - 1) // 10, 3) if size_bytes > 0 else 0
     
-    return f"{size_bytes:.1f} {size_names[i]}"
+    return f"{size_bytes / (1 << (10 * i)):.1f} {size_names[i]}"
 
 def validate_user_input(query: str) -> tuple[bool, str]:
     """
@@ -153,24 +322,15 @@ def extract_weeks_from_query(query: str) -> Optional[int]:
     Returns:
         Optional[int]: Number of weeks if found, None otherwise
     """
-    import re
-    
-    # Look for patterns like "8 weeks", "in 12 weeks", etc.
-    week_patterns = [
-        r'(\d+)\s*weeks?',
-        r'in\s*(\d+)\s*weeks?',
-        r'(\d+)-week',
-    ]
-    
-    for pattern in week_patterns:
-        match = re.search(pattern, query.lower())
-        if match:
-            try:
-                weeks = int(match.group(1))
-                if 1 <= weeks <= 52:  # Reasonable range
-                    return weeks
-            except ValueError:
-                continue
+    match = _WEEKS_PATTERN.search(query)
+    if match:
+        try:
+            weeks = int(match.group(1))
+        except ValueError:
+            # Digit strings past the int conversion limit are not week counts
+            return None
+        if 1 <= weeks <= 52:  # Reasonable range
+            return weeks
     
     return None
 